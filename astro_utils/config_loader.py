@@ -1,6 +1,15 @@
+import copy
 import yaml
 from pathlib import Path
 
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml C binding
+except ImportError:
+    from yaml import SafeLoader
+
+# {absolute config path: (mtime_ns, normalized config)}
+_CONFIG_CACHE = {}
+
 def _normalize_value(value):
     """Ensure config values are loaded consistently, but do not convert to Path automatically."""
     if isinstance(value, dict):
@@ -12,9 +21,18 @@ def _normalize_value(value):
     return value  # int, float, bool, None, etc.
 
 def load_config(config_path="config.yaml"):
+    """Load and normalize a YAML config.
+    The parsed result is cached until the file's mtime changes; each call gets its own copy.
+    """
     config_file = Path(config_path)
     if not config_file.exists():
         raise FileNotFoundError(f"Config file not found: {config_file}")
-    with open(config_file, "r") as f:
-        config = yaml.safe_load(f) or {}
-        return _normalize_value(config)
\ No newline at end of file
+    key = str(config_file.resolve())
+    mtime_ns = config_file.stat().st_mtime_ns
+    cached = _CONFIG_CACHE.get(key)
+    if cached is None or cached[0] != mtime_ns:
+        with open(config_file, "r") as f:
+            config = yaml.load(f, Loader=SafeLoader) or {}
+        cached = (mtime_ns, _normalize_value(config))
+        _CONFIG_CACHE[key] = cached
+    return copy.deepcopy(cached[1])
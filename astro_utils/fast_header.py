@@ -0,0 +1,71 @@
+"""Minimal reader for the primary header of a FITS file.
+
+Only reads the header blocks and only understands plain `KEY = value / comment` cards, which is all the
+pipeline needs from its frames. Anything it can't handle returns None so the caller can fall back to astropy.
+"""
+import re
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+MAX_BLOCKS = 32  # 1152 cards; anything longer goes to the full parser
+
+_INT_RE = re.compile(r"[+-]?\d+$")
+
+
+def _parse_value(field: str):
+    """Parse the value part (columns 11-80) of a card. Raises ValueError for anything unsupported."""
+    s = field.lstrip()
+    if not s or s[0] == "/":
+        return None  # undefined value
+    if s[0] == "'":
+        # string value; '' inside the quotes is an escaped quote
+        parts = []
+        i = 1
+        while True:
+            j = s.find("'", i)
+            if j < 0:
+                raise ValueError("unterminated string")
+            parts.append(s[i:j])
+            if s[j + 1:j + 2] == "'":
+                parts.append("'")
+                i = j + 2
+                continue
+            break
+        value = "".join(parts).rstrip()
+        if value.endswith("&"):
+            raise ValueError("long string (CONTINUE) card")
+        return value
+    token = s.split("/", 1)[0].strip()
+    if token == "T":
+        return True
+    if token == "F":
+        return False
+    if _INT_RE.match(token):
+        return int(token)
+    return float(token.replace("D", "E").replace("d", "e"))
+
+
+def read_primary_header(path):
+    """Return the primary header of `path` as a {keyword: value} dict, or None if it needs the full parser."""
+    header = {}
+    try:
+        with open(path, "rb") as f:
+            for _ in range(MAX_BLOCKS):
+                block = f.read(BLOCK_SIZE)
+                if len(block) < BLOCK_SIZE:
+                    return None
+                text = block.decode("ascii")
+                for i in range(0, BLOCK_SIZE, CARD_SIZE):
+                    key = text[i:i + 8].rstrip()
+                    if key == "END":
+                        return header
+                    if key == "HIERARCH":
+                        return None
+                    if text[i + 8:i + 10] != "= ":
+                        continue  # COMMENT, HISTORY, blank cards
+                    # first occurrence wins, as with astropy's Header.get
+                    if key not in header:
+                        header[key] = _parse_value(text[i + 10:i + CARD_SIZE])
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return None
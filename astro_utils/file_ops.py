@@ -1,4 +1,6 @@
 from pathlib import Path
+import errno
+import os
 import shutil
 import logging
 
@@ -8,6 +10,30 @@ logging.basicConfig(level="DEBUG",
                     format='%(asctime)s - %(levelname)s - %(message)s',
                     datefmt='%Y-%m-%d %H:%M:%S')
 
+def _find_unique_name(parent: Path, base: str, suf: str):
+    """Find a free `{base}_copyN{suf}` name in parent.
+
+    Probes N = 1, 2, 4, 8, ... until a free name is found, then binary-searches
+    back between the last taken and first free index, so N existing copies cost
+    O(log N) stat calls instead of O(N).
+    """
+    def _candidate(i):
+        return parent / f"{base}_copy{i}{suf}"
+
+    if not _candidate(1).exists():
+        return _candidate(1)
+    lo, hi = 1, 2
+    while _candidate(hi).exists():
+        lo, hi = hi, hi * 2
+    # invariant: lo is taken, hi is free
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if _candidate(mid).exists():
+            lo = mid
+        else:
+            hi = mid
+    return _candidate(hi)
+
 def safe_move(src: Path, dest: Path, overwrite: bool = False):
     """Move a file from src to dest safely.
 
@@ -20,17 +46,16 @@ def safe_move(src: Path, dest: Path, overwrite: bool = False):
     dest.parent.mkdir(parents=True, exist_ok=True)
 
     if dest.exists() and not overwrite:
-        base = dest.stem
-        suf = dest.suffix
-        parent = dest.parent
-        i = 1
-        while True:
-            candidate = parent / f"{base}_copy{i}{suf}"
-            if not candidate.exists():
-                dest = candidate
-                break
-            i += 1
-    shutil.move(str(src), str(dest))
+        dest = _find_unique_name(dest.parent, dest.stem, dest.suffix)
+    try:
+        # same volume: metadata-only rename
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # cross-device: copy then remove the source
+        shutil.copy2(src, dest)
+        os.unlink(src)
     logger.debug("Moved %s -> %s", src, dest)
     return dest
 
@@ -42,27 +67,48 @@ def safe_copy(src: Path, dest: Path, overwrite: bool = False):
     dest.parent.mkdir(parents=True, exist_ok=True)
 
     if dest.exists() and not overwrite:
-        base = dest.stem
-        suf = dest.suffix
-        parent = dest.parent
-        i = 1
-        while True:
-            candidate = parent / f"{base}_copy{i}{suf}"
-            if not candidate.exists():
-                dest = candidate
-                break
-            i += 1
-    shutil.copy2(str(src), str(dest))
+        dest = _find_unique_name(dest.parent, dest.stem, dest.suffix)
+    shutil.copy2(src, dest)
     logger.debug("Copied %s -> %s", src, dest)
     return dest
 
+def has_suffix(name: str, suffix: str):
+    """True if `name` ends in `suffix`, ignoring case where the OS does (like glob on Windows)."""
+    return os.path.normcase(name).endswith(os.path.normcase(suffix))
+
+def scandir_recursive(path, suffix: str = None, skip_dirs=()):
+    """Recursively yield os.DirEntry objects for files under `path`, optionally only those ending in `suffix`.
+    DirEntry caches its file type from the directory listing, so no per-entry stat() is needed.
+    Symlinked files are included (like Path.rglob + is_file()); symlinked directories are not descended into,
+    which also rules out loops. Directories whose name is in `skip_dirs` are skipped.
+    The suffix is matched case-insensitively where the OS is, as glob does.
+    """
+    if suffix is not None:
+        suffix = os.path.normcase(suffix)
+    normcase = os.path.normcase
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if e.name not in skip_dirs:
+                        stack.append(e.path)
+                elif e.is_file() and (suffix is None or normcase(e.name).endswith(suffix)):
+                    yield e
+
+def iter_files(base_dir: Path, suffix: str = None):
+    """Yield the paths (as str) of all files under base_dir, optionally only those ending in `suffix`."""
+    for e in scandir_recursive(base_dir, suffix):
+        yield e.path
+
 def ensure_dir(path: Path):
     """Ensure the directory exists, creating it if necessary."""
     path = Path(path)
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
+    # just try to create it: one mkdir call instead of an exists() stat first
+    try:
+        path.mkdir(parents=True)
         logger.debug("Created directory: %s", path)
-    else:
+    except FileExistsError:
         logger.debug("Directory already exists: %s", path)
     return path
 
@@ -1,17 +1,26 @@
 from pathlib import Path
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from astropy.io import fits
 from astropy.time import Time
 import logging
-import yaml
+import os
+from astro_utils.config_loader import load_config
+from astro_utils.file_ops import iter_files
+from astro_utils.fast_header import read_primary_header
+
+try:
+    import fitsio
+    _USE_FITSIO = True
+except ImportError:
+    _USE_FITSIO = False
 
 logger = logging.getLogger(__name__)
 
 # LOAD CONFIG FROM PARENT
 config_path = Path(__file__).parent.parent / "config.yaml"
-with open(config_path) as f:
-    config = yaml.safe_load(f)
+config = load_config(config_path)
 
 # Change these to match your FITS headers
 HEADER_FILTER_KEY = config.get("header_filter_key", "FILTER")
@@ -26,6 +35,11 @@ EXPOSURE_TOLERANCE = config.get("exposure_tolerance", 1)
 ROTATION_TOLERANCE = config.get("rotation_tolerance", 0.5)
 TEMP_TOLERANCE = config.get("temp_tolerance", 1.0)
 
+# Header scans are I/O bound, so use more threads than cores
+HEADER_READ_WORKERS = config.get("header_read_workers") or min(32, (os.cpu_count() or 1) * 4)
+# Parsed headers kept in memory, per (path, mtime)
+HEADER_CACHE_SIZE = 8192
+
 def write_header_info(path: Path, header_info: dict):
     """Write metadata to FITS header."""
     try:
@@ -36,19 +50,44 @@ def write_header_info(path: Path, header_info: dict):
                     hdr[key] = value
                 else:
                     hdr[key] = fits.card.UNDEFINED
-            hdul.flush()
+            # closing the file flushes the changes
     except Exception as e:
         logger.error(f"Failed to write header info to {path}: {e}")
 
+def _file_mtime(path: str):
+    """Return the file's mtime in ns, or None if it cannot be stat'ed."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 def _read_header(path: Path):
+    """Read the primary header of a FITS file.
+    Results are cached per (path, mtime), so repeated reads of an unchanged file are free.
+    Returns {} if the header can't be read; failures are not cached, so a file that was locked
+    or still syncing is read again next time.
+    """
+    path = str(path)
     try:
-        with fits.open(path) as hdul:
-            hdr = hdul[0].header
-            return hdr
-    except Exception as e:
+        return _read_header_cached(path, _file_mtime(path))
+    except Exception:
         logger.exception("Failed to read FITS header: %s", path)
         return {}
 
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _read_header_cached(path: str, mtime_ns):
+    """Uses fitsio (cfitsio) when installed, which is much faster for header-only reads.
+    Otherwise tries the minimal block parser in fast_header, and falls back to astropy for anything it can't handle.
+    Raises on failure, so lru_cache doesn't keep the result.
+    """
+    if _USE_FITSIO:
+        return dict(fitsio.read_header(path, ext=0))
+    hdr = read_primary_header(path)
+    if hdr is not None:
+        return hdr
+    # header only: no need for the full HDUList or a data memmap
+    return fits.getheader(path, ext=0, memmap=False)
+
 def get_val(key:str, tup:tuple)->any:
     """Get value from tuple of (key, value) pairs by key."""
     for k, v in tup:
@@ -56,11 +95,25 @@ def get_val(key:str, tup:tuple)->any:
             return v
     raise KeyError(f"Key {key} not found in tuple. Available keys: {[k for k,v in tup]}")
 
-def read_fits_header_info(path: Path):
+def read_fits_header_info(path: Path, raise_on_error: bool = False):
     """Extract relevant metadata from FITS header.
-    Returns a dictionary of metadata values.
+    Returns a dictionary of metadata values; all None if the header can't be read,
+    unless raise_on_error is set, in which case the read error is raised.
     """
-    hdr = _read_header(path)
+    path = str(path)
+    try:
+        return dict(_read_fits_header_info_cached(path, _file_mtime(path)))
+    except Exception:
+        if raise_on_error:
+            raise
+        logger.exception("Failed to read FITS header: %s", path)
+        return _header_info({})
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _read_fits_header_info_cached(path: str, mtime_ns):
+    return _header_info(_read_header_cached(path, mtime_ns))
+
+def _header_info(hdr):
     fit_dict = {
         HEADER_FILTER_KEY: hdr.get(HEADER_FILTER_KEY),
         HEADER_ROTATION_KEY: _safe_cast_float(hdr.get(HEADER_ROTATION_KEY)),
@@ -84,14 +137,12 @@ def parse_date_from_header(path: Path):
     -> If not DATE-LOC, then DATE-OBS. 
     """
     date_keys = ("DATE-LOC", "DATE-OBS")
-    try:
-        hdr = read_fits_header_info(path)
-    except:
-        logger.error(f"Failed to read FITS header: {path}")
+    hdr = _read_header(path)
     date_str = hdr.get("DATE-OBS")
     if date_str:
         try:
-            return datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S").date()
+            # DATE-OBS is ISO-8601; only the leading YYYY-MM-DD is needed
+            return date.fromisoformat(date_str[:10])
         except Exception as e:
             logger.error(f"Failed to parse DATE-OBS from header: {e}")
     return None
@@ -103,8 +154,16 @@ def parse_date_from_path(path: Path):
     Returns datetime.date or None.
     """
     for part in reversed(path.parts):
+        seg = part.split("_")[0]
+        # fast path for the exact YYYY-MM-DD shape; anything else gets strptime's (looser) rules, as before
+        if (len(seg) == 10 and seg[4] == "-" and seg[7] == "-" and seg.isascii()
+                and seg[:4].isdigit() and seg[5:7].isdigit() and seg[8:].isdigit()):
+            try:
+                return date.fromisoformat(seg)
+            except ValueError:
+                continue  # e.g. 2024-02-30: strptime rejects it too
         try:
-            return datetime.strptime(part.split("_")[0], "%Y-%m-%d").date()
+            return datetime.strptime(seg, "%Y-%m-%d").date()
         except Exception:
             continue
     return None
@@ -120,6 +179,34 @@ def parse_date_from_master_path(master_path: Path):
         return None
 
 
+def _disk_order(path: str):
+    """Sort key approximating on-disk layout: (device, inode)."""
+    try:
+        st = os.stat(path)
+        return (st.st_dev, st.st_ino)
+    except OSError:
+        return (0, 0)
+
+
+def _build_entry(p: str):
+    """Collect the grouping metadata for a single FITS file.
+    Values are kept raw from the header; numeric columns are cast in bulk by the caller.
+    """
+    hdr = _read_header(p)
+    path = Path(p)
+    date = parse_date_from_path(path) or None
+    return {
+        "path": path,
+        "filter": hdr.get(HEADER_FILTER_KEY),
+        "rot": hdr.get(HEADER_ROTATION_KEY),
+        "gain": hdr.get(HEADER_GAIN_KEY),
+        "offset": hdr.get(HEADER_OFFSET_KEY),
+        "date": date,
+        "exptime": hdr.get(HEADER_EXPTIME_KEY),
+        "temp": hdr.get(HEADER_TEMPERATURE_KEY)
+    }
+
+
 def group_fits_by_metadata(base_dir: Path, days_within: int = 0, ignore_rotation: bool = False):
     """Group FITS files by matched metadata.
 
@@ -129,84 +216,97 @@ def group_fits_by_metadata(base_dir: Path, days_within: int = 0, ignore_rotation
     Returns dict: {group_key: [Path,...]}
     group_key is a readable string.
     """
-    files = [p for p in base_dir.rglob("*.fits") if p.is_file()]
-
-    # Build entries with metadata
-    entries = []
-    for p in files:
-        fits_dict = read_fits_header_info(p)
-        date = parse_date_from_path(p) or None
-        entries.append({
-            "path": p,
-            "filter": fits_dict.get(HEADER_FILTER_KEY),
-            "rot": fits_dict.get(HEADER_ROTATION_KEY),
-            "gain": fits_dict.get(HEADER_GAIN_KEY),
-            "offset": fits_dict.get(HEADER_OFFSET_KEY),
-            "date": date,
-            "exptime": fits_dict.get(HEADER_EXPTIME_KEY),
-            "temp": fits_dict.get(HEADER_TEMPERATURE_KEY)
-        })
-
-    # Naive grouping: cluster by exact equality of non-date metadata, optionally rotation,
-    # then split clusters by date windows.
-    clusters = defaultdict(list)
-    for e in entries:
-        key_parts = [str(e["filter"]), str(e["gain"]), str(e["offset"])]
-        if not ignore_rotation:
-            key_parts.append(str(round(e["rot"], 3)) if e["rot"] is not None else "None")
-        base_key = "|".join(key_parts)
-        clusters[base_key].append(e)
+    files = list(iter_files(base_dir, ".fits"))
+    # read in on-disk order so the OS readahead works for us instead of seeking around
+    files.sort(key=_disk_order)
+
+    # Build entries with metadata, overlapping the header reads across threads
+    with ThreadPoolExecutor(max_workers=HEADER_READ_WORKERS) as executor:
+        entries = list(executor.map(_build_entry, files))
+
+    if not entries:
+        return {}
+    import pandas as pd
+
+    # Columnar metadata table; grouping keys are rendered to strings column-wise,
+    # which also keeps missing values as "None" rather than NaN group keys.
+    df = pd.DataFrame(entries, dtype=object)
+    key_cols = ["filter", "gain", "offset"]
+    if not ignore_rotation:
+        # one vectorized cast; unparseable values become NaN -> "None"
+        rot = pd.to_numeric(df["rot"], errors="coerce").astype(float).round(3)  # float even if all ints: "90.0"
+        df["rot"] = rot.astype(str).where(rot.notna(), "None")
+        key_cols.append("rot")
+    dates = df["date"].copy()
+    for col in ("filter", "gain", "offset", "date"):
+        df[col] = df[col].where(df[col].notna(), "None").astype(str)
 
     groups = {}
-    for base_key, members in clusters.items():
-        # if days_within == 0 then treat per-date (must be same date)
-        if days_within == 0:
-            by_date = defaultdict(list)
-            for m in members:
-                by_date[str(m.get("date"))].append(m["path"])
-            for dt, paths in by_date.items():
-                if not paths:
-                    continue
-                key = f"{base_key}__date_{dt}"
-                groups[key] = sorted(paths)
-        else:
-            # sort by date (if missing date put at epoch)
-            def _date_or_epoch(m):
-                return m.get("date") or datetime(1970, 1, 1).date()
-
-            members_sorted = sorted(members, key=_date_or_epoch)
-            # sliding window grouping
-            current_group = [members_sorted[0]]
-            for cur in members_sorted[1:]:
-                prev = current_group[-1]
-                prev_date = prev.get("date") or datetime(1970, 1, 1).date()
-                cur_date = cur.get("date") or datetime(1970, 1, 1).date()
-                delta_days = abs((cur_date - prev_date).days)
-                if delta_days <= days_within:
-                    current_group.append(cur)
-                else:
-                    # flush
-                    key = _make_group_key(base_key, current_group)
-                    groups[key] = [m["path"] for m in current_group]
-                    current_group = [cur]
-            # flush last
-            if current_group:
-                key = _make_group_key(base_key, current_group)
-                groups[key] = [m["path"] for m in current_group]
+    # if days_within == 0 then treat per-date (must be same date)
+    if days_within == 0:
+        for key, sub in df.groupby(key_cols + ["date"], sort=False):
+            base_key = "|".join(key[:-1])
+            groups[f"{base_key}__date_{key[-1]}"] = sorted(sub["path"])
+        return groups
+
+    # otherwise cluster by exact equality of non-date metadata, then split clusters by date windows
+    for key, sub in df.groupby(key_cols, sort=False):
+        base_key = "|".join(key)
+        members = sorted(zip(dates[sub.index], sub["path"]), key=_date_or_epoch)
+
+        # sliding window grouping; members are date-sorted, so the window's
+        # first and last dates are its min/max
+        first_date, first_path = members[0]
+        current_group = [first_path]
+        prev_date = first_date
+        for cur_date, path in members[1:]:
+            delta_days = abs((_or_epoch(cur_date) - _or_epoch(prev_date)).days)
+            if delta_days <= days_within:
+                current_group.append(path)
+            else:
+                # flush
+                groups[_make_group_key(base_key, (first_date, prev_date))] = current_group
+                first_date, current_group = cur_date, [path]
+            prev_date = cur_date
+        # flush last
+        groups[_make_group_key(base_key, (first_date, prev_date))] = current_group
 
     return groups
 
 
-def _make_group_key(base_key: str, members: list):
-    dates = sorted(set(str(m.get("date")) for m in members))
-    date_part = dates[0] if len(dates) == 1 else f"{dates[0]}_to_{dates[-1]}"
+def _or_epoch(d):
+    """Missing dates sort (and window) as the epoch."""
+    return d or datetime(1970, 1, 1).date()
+
+
+def _date_or_epoch(member: tuple):
+    return _or_epoch(member[0])
+
+
+def _make_group_key(base_key: str, date_range: tuple):
+    min_d, max_d = date_range
+    date_part = str(min_d) if min_d == max_d else f"{min_d}_to_{max_d}"
     return f"{base_key}__{date_part}"
 
 
-def is_flat_frame_compatible(light_path: Path, flat_path: Path, rotation_tolerance: float = ROTATION_TOLERANCE):
-    light_dict = read_fits_header_info(light_path)
-    flat_dict = read_fits_header_info(flat_path)
-    
+def extract_flat_keys(path: Path):
+    """Get the metadata used to match a flat to a light frame.
+    Reads are cached, so callers looping over light/flat pairs can call this freely,
+    or precompute the dicts once and use `compare_flat_keys` directly.
+    """
+    fits_dict = read_fits_header_info(path)
+    return {
+        HEADER_FILTER_KEY: fits_dict.get(HEADER_FILTER_KEY),
+        HEADER_GAIN_KEY: fits_dict.get(HEADER_GAIN_KEY),
+        HEADER_OFFSET_KEY: fits_dict.get(HEADER_OFFSET_KEY),
+        HEADER_ROTATION_KEY: fits_dict.get(HEADER_ROTATION_KEY)
+    }
+
+
+def compare_flat_keys(light_dict: dict, flat_dict: dict, rotation_tolerance: float = ROTATION_TOLERANCE):
+    """Check whether a flat matches a light frame, from their `extract_flat_keys` dicts.
+    Returns (compatible, reason).
+    """
     # collect metadata
     lfilt = light_dict.get(HEADER_FILTER_KEY)
     ffilt = flat_dict.get(HEADER_FILTER_KEY)
@@ -236,4 +336,8 @@ def is_flat_frame_compatible(light_path: Path, flat_path: Path, rotation_toleran
         return False, "Rotation info missing"
     if abs(lrot - frot) > rotation_tolerance:
         return False, f"Rotation off by {abs(lrot-frot):.2f}° (tolerance {rotation_tolerance}°)"
-    return True, ""
\ No newline at end of file
+    return True, ""
+
+
+def is_flat_frame_compatible(light_path: Path, flat_path: Path, rotation_tolerance: float = ROTATION_TOLERANCE):
+    return compare_flat_keys(extract_flat_keys(light_path), extract_flat_keys(flat_path), rotation_tolerance)
\ No newline at end of file
@@ -1,11 +1,24 @@
 from pathlib import Path
 from pyexpat.errors import messages
-from time import sleep
+from time import sleep, monotonic
 import subprocess
+import threading
 import logging
 import json
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    _USE_WATCHDOG = True
+except ImportError:
+    _USE_WATCHDOG = False
+
 logger = logging.getLogger(__name__)
 
 PIXINSIGHT_PATH = r"C:\Program Files\PixInsight\bin\PixInsight.exe"
@@ -15,6 +28,11 @@ CONFIG_DIR = Path("C:/Temp/PixStack")
 INPUT_FILES_JSON = CONFIG_DIR / "input_files.json"
 PARAMS_JSON = CONFIG_DIR / "params.json"
 
+# Signal files written by the pixscripts when they finish
+LAUNCH_DONE_FILE = CONFIG_DIR / "launch_done.tmp"
+STACK_DONE_FILE = CONFIG_DIR / "basic_stack_complete.tmp"
+CALIBRATION_DONE_FILE = CONFIG_DIR / "calibration_complete.tmp"
+
 
 def _run_cmd(cmd_list):
     """Run the command and log output/errors."""
@@ -31,9 +49,51 @@ def _run_cmd(cmd_list):
     
 def save_json(data, path):
     path.parent.mkdir(parents=True, exist_ok=True)
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
     with open(path, 'w') as f:
         json.dump(data, f, indent=2)
 
+def wait_for_file(path: Path, timeout: float = None, poll_interval: float = 1.0):
+    """Block until `path` exists. Returns True once it does, False if `timeout` (s) runs out.
+    Uses watchdog file-system events when installed (wakes as soon as the file is created),
+    otherwise polls every `poll_interval` seconds.
+    """
+    path = Path(path)
+    if path.exists():
+        return True
+
+    if _USE_WATCHDOG:
+        created = threading.Event()
+
+        class _Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if Path(event.src_path).name == path.name:
+                    created.set()
+
+            def on_moved(self, event):
+                if Path(event.dest_path).name == path.name:
+                    created.set()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        observer = Observer()
+        observer.schedule(_Handler(), str(path.parent), recursive=False)
+        observer.start()
+        try:
+            # the file may have appeared before the observer started
+            return path.exists() or created.wait(timeout)
+        finally:
+            observer.stop()
+            observer.join()
+
+    deadline = None if timeout is None else monotonic() + timeout
+    while not path.exists():
+        if deadline is not None and monotonic() >= deadline:
+            return False
+        sleep(poll_interval)
+    return True
+
 def launch_pixinsight(instance=None,
                       script_path: Path = None
                       ):
@@ -59,13 +119,11 @@ def launch_pixinsight(instance=None,
         logger.info(f"Launched PixInsight in automation mode: {process.pid}")
         
         # wait for the launch_done.tmp file to appear
-        done_path = Path("C:/Temp/PixStack/launch_done.tmp")
-        while not done_path.exists():
-            sleep(1)
+        done_path = LAUNCH_DONE_FILE
+        wait_for_file(done_path)
         logger.info("PixInsight is ready.")
         # remove the temporary file
-        while done_path.exists():
-            done_path.unlink(missing_ok=True)
+        done_path.unlink(missing_ok=True)
 
     except Exception as e:
         logger.exception("Failed to launch PixInsight.")
@@ -108,7 +166,37 @@ def stack_with_pixinsight(
     #    "--force-exit"
     # ]
     
-    # NEW -> Build command list but use existing instance!
+    _run_stack_script(script_path, instance)
+
+    return
+
+
+def stack_batches_with_pixinsight(
+    jobs,
+    instance=None,
+    script_path: Path = None):
+    """
+    Stack several file lists in a single PixInsight run.
+    `jobs` is a list of (file_list, output_path); the script integrates them one after another
+    and signals once when all are done, so the per-run startup cost is paid once.
+    """
+    if script_path is None:
+        script_path = "pixscripts/basic_stack_script.js"
+
+    job_params = []
+    for file_list, output_path in jobs:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        job_params.append({
+            "input_files": [str(Path(f).absolute()) for f in file_list],
+            "output_path": str(Path(output_path).absolute())
+        })
+    save_json({"jobs": job_params}, PARAMS_JSON)
+
+    _run_stack_script(script_path, instance)
+
+
+def _run_stack_script(script_path, instance=None):
+    """Execute the stacking script in an existing instance and wait for its completion signal."""
     execute_arg = f'-x={instance}:{script_path}' if instance is not None else f'-x={script_path}'
     cmd = [
         PIXINSIGHT_PATH,
@@ -117,14 +205,10 @@ def stack_with_pixinsight(
     ]
     _run_cmd(cmd)
 
-    donepath = Path("C:/Temp/PixStack/basic_stack_complete.tmp")
-    while not donepath.exists():
-        sleep(1)
+    donepath = STACK_DONE_FILE
+    wait_for_file(donepath)
     # remove the temporary file
-    while donepath.exists():
-        donepath.unlink(missing_ok=True)
-
-    return
+    donepath.unlink(missing_ok=True)
 
 
 
@@ -179,11 +263,9 @@ def calibrate_with_pixinsight(
 
     _run_cmd(cmd)
 
-    donepath = Path("C:/Temp/PixStack/calibration_complete.tmp")
-    while not donepath.exists():
-        sleep(1)
+    donepath = CALIBRATION_DONE_FILE
+    wait_for_file(donepath)
     # remove the temporary file
-    while donepath.exists():
-        donepath.unlink(missing_ok=True)
+    donepath.unlink(missing_ok=True)
 
     return
\ No newline at end of file
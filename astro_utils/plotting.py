@@ -1,15 +1,44 @@
+import matplotlib
+matplotlib.use("Agg")  # file output only; never start a GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 import json
 import logging
 from pathlib import Path
-from collections import defaultdict
 from astro_utils.file_ops import ensure_dir
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
 
 
+def _flatten_log(log_data: dict):
+    """Flatten the nested {date: {filter: {exposure: {...}}}} calibration log into one row per group."""
+    records = []
+    for date, date_data in log_data.items():
+        if date == "Target name":
+            continue
+        for filt, filt_data in date_data.items():
+            for expt, expt_data in filt_data.items():
+                flat_master = expt_data.get("flat_master", "Missing")
+                dark_master = expt_data.get("dark_master", "Missing")
+                records.append({
+                    "date": date,
+                    "filter": filt,
+                    "expt": expt,
+                    "exposure": int(float(expt)),
+                    "num_calibrated": expt_data.get("num calibrated", 0),
+                    "num_failed": len(expt_data.get("failed lights", [])),
+                    "flat_master": flat_master if flat_master == "Missing" else Path(flat_master).name,
+                    "dark_master": dark_master if dark_master == "Missing" else Path(dark_master).name,
+                })
+    df = pd.DataFrame(records, columns=["date", "filter", "expt", "exposure", "num_calibrated",
+                                        "num_failed", "flat_master", "dark_master"])
+    df["num_total"] = df["num_calibrated"] + df["num_failed"]
+    df["seconds"] = df["num_calibrated"] * df["exposure"]
+    return df
+
+
 def plot_summary(calibration_log_path: Path):
     """Creates several summary plots from the calibration log file.
     
@@ -34,93 +63,62 @@ def plot_summary(calibration_log_path: Path):
     output_dir = calibration_log_path.parent / "summary_plots"
     ensure_dir(output_dir)
     
+    # Flatten the log once; all three plots derive from it
+    df = _flatten_log(log_data)
+
     # === Plot 1: Table ===
-    table_data = []
     headers = ["Date", "Filter", "Exposure (s)", "Num Calibrated", "Num Failed", "Flat Master", "Dark Master"]
-    for date, date_data in log_data.items():
-        if date == "Target name":
-            continue
-        
-        for filt, filt_data in date_data.items():
-            for expt, expt_data in filt_data.items():
-                num_cal = expt_data.get("num calibrated", 0)
-                num_fail = len(expt_data.get("failed lights", []))
-                flat_master = expt_data.get("flat_master", "Missing")
-                if flat_master != "Missing":
-                    flat_master = Path(flat_master).name
-                dark_master = expt_data.get("dark_master", "Missing")
-                if dark_master != "Missing":
-                    dark_master = Path(dark_master).name
-                table_data.append([date, filt, expt, num_cal, num_fail, flat_master, dark_master])
+    table_data = df[["date", "filter", "expt", "num_calibrated", "num_failed",
+                     "flat_master", "dark_master"]].values.tolist()
     
-    fig, ax = plt.subplots(figsize=(15, 6))
+    # --- Size columns and figure from the text itself, no render pass needed ---
+    # approx. width of a 10pt character and height of a row, in inches
+    char_w, row_h, pad_w = 0.085, 0.3, 0.3
+    col_chars = [len(h) for h in headers]
+    for row in table_data:
+        for i, v in enumerate(row):
+            col_chars[i] = max(col_chars[i], len(str(v)))
+    col_inches = [n * char_w + pad_w for n in col_chars]
+    table_w = sum(col_inches)
+    table_h = row_h * (len(table_data) + 1)
+
+    fig, ax = plt.subplots(figsize=(table_w, table_h))
+    fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
     ax.axis('off')
-    table = ax.table(cellText=table_data, colLabels=headers, cellLoc='center', loc='center')
+    table = ax.table(cellText=table_data, colLabels=headers, cellLoc='center',
+                     colWidths=[w / table_w for w in col_inches], bbox=[0, 0, 1, 1])
     table.auto_set_font_size(False)
     table.set_fontsize(10)
-    table.auto_set_column_width(col=list(range(len(headers))))
-    table.scale(1.2, 1.2)
-    
-    # --- Resize figure to fit table ---
-    fig.canvas.draw()  # need a draw before bbox is available
-    bbox = table.get_window_extent(fig.canvas.get_renderer())
-
-    # Convert from pixels to inches
-    fig_width, fig_height = bbox.width / fig.dpi, bbox.height / fig.dpi
-
-    # Add margins for title/axes
-    margin_w, margin_h = 2, 2
-    fig.set_size_inches(fig_width + margin_w, fig_height + margin_h)
     
     # table.axes.set_title(f"Calibration Summary for {log_data['Target name']}", fontsize=15, y=0.85)
-    plt.tight_layout()
     plt.savefig(output_dir / f"calibration_summary_table_{log_data['Target name']}.png", bbox_inches='tight', dpi=300)
-    plt.close()
+    plt.close(fig)
         
     # === Plot 2: Bar chart across all dates ===
-    records = []
-    for date, date_data in log_data.items():
-        if date == "Target name":
-            continue
-        for filt, filt_data in date_data.items():
-            for expt, expt_data in filt_data.items():
-                expt_int = int(float(expt))
-                num_cal = expt_data.get("num calibrated", 0)
-                num_fail = len(expt_data.get("failed lights", []))
-                records.append({
-                    "date": date,
-                    "filter": filt,
-                    "exposure": expt_int,
-                    "num_calibrated": num_cal,
-                    "num_total": num_cal + num_fail,
-                    "seconds": num_cal * expt_int
-                })
-
-    if records:
-        import pandas as pd
-        df = pd.DataFrame(records)
-        df = df.sort_values("date")
+    if not df.empty:
+        bar_df = df.sort_values("date")
 
         # Compute cumulative hours across dates
-        df["cumulative_hours"] = df["seconds"].cumsum() / 3600
+        bar_df["cumulative_hours"] = bar_df["seconds"].cumsum() / 3600
 
         # Build x labels: date + filter + exposure
-        df["label"] = df.apply(lambda r: f"{r['date']}\n{r['filter']} {r['exposure']}s", axis=1)
-        x = range(len(df))
+        bar_df["label"] = (bar_df["date"].astype(str) + "\n" + bar_df["filter"].astype(str) + " "
+                           + bar_df["exposure"].astype(str) + "s")
+        x = range(len(bar_df))
 
-        fig, ax1 = plt.subplots(figsize=(max(12, len(df) * 0.6), 6))
+        fig, ax1 = plt.subplots(figsize=(max(12, len(bar_df) * 0.6), 6))
 
-        ax1.bar(x, df["num_total"], color="lightgray", label="Total Lights")
-        ax1.bar(x, df["num_calibrated"], color="skyblue", label="Calibrated Lights")
+        ax1.bar(x, bar_df["num_total"], color="lightgray", label="Total Lights")
+        ax1.bar(x, bar_df["num_calibrated"], color="skyblue", label="Calibrated Lights")
 
         ax1.set_xticks(x)
-        ax1.set_xticklabels(df["label"], rotation=45, ha="right")
+        ax1.set_xticklabels(bar_df["label"], rotation=45, ha="right")
         ax1.set_ylabel("Number of Lights")
         ax1.legend(loc="upper left", framealpha=0.95)
         # ax1.grid(axis="y")
 
         ax2 = ax1.twinx()
-        ax2.plot(x, df["cumulative_hours"], color="orange", marker="o", label="Cumulative Hours")
+        ax2.plot(x, bar_df["cumulative_hours"], color="orange", marker="o", label="Cumulative Hours")
         ax2.set_ylabel("Cumulative Hours of Calibrated Lights")
         # change color of y-axis to match line
         ax2.yaxis.label.set_color("orange")
@@ -130,42 +128,33 @@ def plot_summary(calibration_log_path: Path):
         plt.title(f"Calibrated vs Total Lights Over Time for {log_data['Target name']}", fontsize=14)
         plt.tight_layout()
         plt.savefig(output_dir / f"calibration_barchart_{log_data['Target name']}.png", dpi=300)
-        plt.close()
+        plt.close(fig)
         
     # === Plot 3: Pie chart for entire target ===
-    filter_seconds = defaultdict(int)
-    total_seconds = 0
-    for date, date_data in log_data.items():
-        if date == "Target name":
-            continue
-        for filt, filt_data in date_data.items():
-            for expt, expt_data in filt_data.items():
-                expt_int = int(float(expt))
-                num_cal = expt_data.get("num calibrated", 0)
-                filter_seconds[filt] += num_cal * expt_int
-                total_seconds += num_cal * expt_int
-
-    if not filter_seconds:
+    if df.empty:
         logger.warning(f"No calibrated lights found for target {log_data['Target name']}. Skipping pie chart.")
         return
+    filter_seconds = df.groupby("filter", sort=False)["seconds"].sum()
+    total_seconds = filter_seconds.sum()
 
     fig, ax = plt.subplots(figsize=(8, 8))
-    labels = list(filter_seconds.keys())
-    sizes = list(filter_seconds.values())
+    labels = filter_seconds.index.tolist()
+    sizes = filter_seconds.tolist()
 
     # Make the pie slices
     wedges, _ = ax.pie(sizes, startangle=140)
 
-    # Custom labels inside wedges
-    for i, (wedge, filt) in enumerate(zip(wedges, labels)):
-        pct = sizes[i] / sum(sizes) * 100
-        hours = sizes[i] / 3600
-
-        # Position label at the wedge center (closer to inside)
-        ang = (wedge.theta2 + wedge.theta1) / 2.
-        x = 0.7 * np.cos(np.deg2rad(ang))
-        y = 0.7 * np.sin(np.deg2rad(ang))
+    # Label geometry for all wedges at once
+    sizes_arr = np.asarray(sizes, dtype=float)
+    pcts = sizes_arr / sizes_arr.sum() * 100
+    hours_arr = sizes_arr / 3600
+    # Position labels at the wedge centers (closer to inside)
+    angs = np.deg2rad([(w.theta2 + w.theta1) / 2. for w in wedges])
+    xs = 0.7 * np.cos(angs)
+    ys = 0.7 * np.sin(angs)
 
+    # Custom labels inside wedges
+    for filt, x, y, pct, hours in zip(labels, xs, ys, pcts, hours_arr):
         # Filter name (bold, bigger)
         ax.text(
             x, y + 0.08, filt,
@@ -188,4 +177,5 @@ def plot_summary(calibration_log_path: Path):
     )
     plt.tight_layout()
     plt.savefig(output_dir / "calibration_chart.png", dpi=300)
-    plt.close()
\ No newline at end of file
+    plt.close(fig)
+    plt.close('all')
\ No newline at end of file
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 # import argparse
+import errno
 import os
 from pathlib import Path
 import shutil
 import sys
 import logging
-import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from astro_utils.config_loader import load_config
+from astro_utils.file_ops import scandir_recursive
 
 config_path = Path(__file__).parent / "config.yaml"
 config = load_config(config_path)
@@ -20,6 +22,9 @@ DELETE_AFTER_TRANSFER = config.get("delete_after_transfer")
 REMOVE_EMPTY_DIRS = config.get("remove_empty_dirs")
 REVERSE_TRANSFER = config.get("reverse_transfer")
 SPECIFIC_DIR_KEYWORDS = config.get("specific_dir_keywords", [])
+TRANSFER_WORKERS = config.get("transfer_workers", 8)
+# Copies queued at once; keeps the executor's queue short instead of holding the whole tree
+MAX_IN_FLIGHT = TRANSFER_WORKERS * 4
 
 if REVERSE_TRANSFER:
     temp = DROPBOX_SOURCE
@@ -30,49 +35,75 @@ print(f"Source: {DROPBOX_SOURCE} >>> EXISTS: {DROPBOX_SOURCE.exists()}")
 print(f"Destination: {LOCAL_TARGET} >>> EXISTS: {LOCAL_TARGET.exists()}")
 print(f"Delete after transfer: {DELETE_AFTER_TRANSFER}\n")
                 
+# force: importing astro_utils.file_ops already ran its own DEBUG basicConfig
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S')
+                    datefmt='%Y-%m-%d %H:%M:%S',
+                    force=True)
 logger = logging.getLogger(__name__)
 
+FILE_ATTRIBUTE_OFFLINE = 0x00001000
+FILE_ATTRIBUTE_PINNED = 0x00080000
+FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS = 0x00400000
+INVALID_FILE_ATTRIBUTES = 0xFFFFFFFF
 
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _GetFileAttributesW = _kernel32.GetFileAttributesW
+    _GetFileAttributesW.argtypes = [wintypes.LPCWSTR]
+    _GetFileAttributesW.restype = wintypes.DWORD
+    _SetFileAttributesW = _kernel32.SetFileAttributesW
+    _SetFileAttributesW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD]
+    _SetFileAttributesW.restype = wintypes.BOOL
 
 def _ensure_local(file: Path):
-    """Force Dropbox to download a file if it's cloud-only."""
+    """Force Dropbox to download a file if it's cloud-only.
+    Equivalent to `attrib -P <file>`, but clears the attribute in-process instead of spawning a shell per file.
+    """
+    if sys.platform != "win32":
+        return
     try:
-        if file.exists():
-            # This will force Dropbox to download the file
-            subprocess.run(["attrib", "-P", str(file)], shell=True)
+        attrs = _GetFileAttributesW(str(file))
+        if attrs == INVALID_FILE_ATTRIBUTES:
+            return  # missing or inaccessible
+        if not attrs & (FILE_ATTRIBUTE_OFFLINE | FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS):
+            return  # already hydrated
+        if attrs & FILE_ATTRIBUTE_PINNED:
+            if not _SetFileAttributesW(str(file), attrs & ~FILE_ATTRIBUTE_PINNED):
+                raise ctypes.WinError(ctypes.get_last_error())
     except Exception as e:
         logger.warning(f"Could not ensure local copy for {file}: {e}")
 
 
 def _remove_empty_dirs(path: Path, protect_root: bool = False):
     """
-    Recursively remove empty directories starting from `path`.
+    Remove empty directories under `path`, deepest first.
     Treats folders that only contain 'desktop.ini' as empty.
     """
     if not path.exists():
         return
 
-    for child in list(path.iterdir()):
-        if child.is_dir():
-            _remove_empty_dirs(child, protect_root=False)
-
-    # Collect contents excluding desktop.ini
-    items = list(path.iterdir())
-    non_desktop_items = [item for item in items if item.name.lower() != "desktop.ini"]
-
-    if not non_desktop_items:
+    root = str(path)
+    removed = set()
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        # dirnames was listed before its children were visited, so skip the ones removed since
+        if any(os.path.join(dirpath, d) not in removed for d in dirnames):
+            continue
+        if any(f.lower() != "desktop.ini" for f in filenames):
+            continue
         try:
-            for item in items:
-                if item.name.lower() == "desktop.ini":
-                    item.unlink(missing_ok=True)
-            if not protect_root:
-                path.rmdir()
-                logger.info(f"Removed empty directory: {path}")
+            for f in filenames:
+                os.unlink(os.path.join(dirpath, f))
+            if protect_root and dirpath == root:
+                continue
+            os.rmdir(dirpath)
+            removed.add(dirpath)
+            logger.info(f"Removed empty directory: {dirpath}")
         except Exception as e:
-            logger.warning(f"Could not remove {path}: {e}")
+            logger.warning(f"Could not remove {dirpath}: {e}")
 
 
 def _cleanup_subdirs(source: Path, subdirs):
@@ -83,10 +114,28 @@ def _cleanup_subdirs(source: Path, subdirs):
             _remove_empty_dirs(target_dir, protect_root=True)
 
 
+def _finish_transfers(done, in_flight: dict):
+    """Log each finished transfer in `done`, drop it from `in_flight` and return how many there were."""
+    n = 0
+    for future in done:
+        future.result()
+        logger.info(f"    ├── {in_flight.pop(future).name}")
+        n += 1
+    return n
+
+
 def _move_with_retry(src: Path, dst: Path, delete_after_transfer: bool, retries=3):
     for attempt in range(retries):
         try:
             _ensure_local(src)
+            if delete_after_transfer:
+                # Same volume: a rename moves no data
+                try:
+                    os.replace(src, dst)
+                    return
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
             shutil.copy2(src, dst)
             if delete_after_transfer:
                 os.remove(src)
@@ -98,6 +147,21 @@ def _move_with_retry(src: Path, dst: Path, delete_after_transfer: bool, retries=
             else:
                 raise
 
+def _iter_by_top_level(path: Path):
+    """
+    Yield the files under `path` one top-level folder at a time, each batch sorted by path.
+    Only one folder's listing is held in memory, so copying can start before the whole tree is walked.
+    """
+    with os.scandir(path) as it:
+        tops = sorted(it, key=lambda e: e.name)
+    files = [e for e in tops if e.is_file()]
+    if files:
+        yield files
+    for top in tops:
+        if top.is_dir(follow_symlinks=False):
+            yield sorted(scandir_recursive(top.path), key=lambda e: e.path)
+
+
 def transfer_files(source: Path, 
                    dest: Path, 
                    subdirs: list|str, 
@@ -117,26 +181,33 @@ def transfer_files(source: Path,
             logger.info(f"Skipping missing or invalid subdirectory: {subdir}")
             continue
         logger.info(f"{subdir}/")
-        last_parent = None
-        for file in sorted(subdir_path.rglob("*")):
-            # check for specific keyword
-            if all(keyword in file.parts for keyword in specific_dir_keywords):
-                if file.is_file():
-                    rel_path = file.relative_to(source)
-                    dest_file = dest / rel_path
-                    dest_file.parent.mkdir(parents=True, exist_ok=True)
-
-                    # Print directory header if we’re in a new first-level directory
-                    if rel_path.parts[0] != last_parent:
-                        last_parent = rel_path.parts[0]
-
+        with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as ex:
+            in_flight = {}  # {future: src}
+            for batch in _iter_by_top_level(subdir_path):
+                work = []
+                for entry in batch:
+                    # check for specific keyword
+                    parts = entry.path.split(os.sep)
+                    if not all(keyword in parts for keyword in specific_dir_keywords):
+                        continue
+                    dest_file = dest / os.path.relpath(entry.path, source)
                     if dest_file.exists():
-                        logger.info(f"    ├── {rel_path.name} (skipped; exists)")
+                        logger.info(f"    ├── {entry.name} (skipped; exists)")
                         continue
+                    work.append((Path(entry.path), dest_file))
+
+                # Create destination folders up front so workers never race on mkdir
+                for parent in {dst.parent for _, dst in work}:
+                    parent.mkdir(parents=True, exist_ok=True)
+
+                # Queue this folder's copies, never more than MAX_IN_FLIGHT at a time
+                for src, dst in work:
+                    if len(in_flight) >= MAX_IN_FLIGHT:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        count += _finish_transfers(done, in_flight)
+                    in_flight[ex.submit(_move_with_retry, src, dst, delete_after_transfer, 3)] = src
 
-                    _move_with_retry(file, dest_file, delete_after_transfer, retries=3)
-                    logger.info(f"    ├── {rel_path.name}")
-                    count += 1
+            count += _finish_transfers(as_completed(list(in_flight)), in_flight)
                 
         # After moving files, remove the subdirectory if empty
         if cleanup_sources:
@@ -1,15 +1,24 @@
 #!/usr/bin/env python3
+import os
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from bisect import bisect_left
 from time import sleep, time
 from astro_utils.config_loader import load_config
-from astro_utils.fits_helpers import read_fits_header_info, parse_date_from_path, parse_date_from_master_path
+from astro_utils.fits_helpers import (read_fits_header_info, parse_date_from_path, parse_date_from_master_path,
+                                     HEADER_READ_WORKERS)
 from astro_utils.pixinsight_cli import launch_pixinsight, calibrate_with_pixinsight
-from astro_utils.file_ops import ensure_dir, get_target_name
-from astro_utils.plotting import plot_summary
+from astro_utils.file_ops import ensure_dir, get_target_name, has_suffix, scandir_recursive
 import logging
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # --- Logging ---
 logger = logging.getLogger(__name__)
 
@@ -25,6 +34,7 @@ MAX_FLAT_DAYS_DIFF = config.get("calibration_search_days_flat", 4)
 MAX_DARK_MONTHS_DIFF = config.get("calibration_search_months_dark", 3)
 ROT_TOLERANCE = config.get("flat_rotation_tolerance", 0.5)
 OVERWRITE_EXISTING = config.get("overwrite_existing", False)
+MASTER_INDEX_NAME = ".skystack_master_index.json"
 
 # FITS keywords
 HEADER_FILTER_KEY = config.get("header_filter_key")
@@ -34,56 +44,227 @@ HEADER_OFFSET_KEY = config.get("header_offset_key")
 HEADER_EXPTIME_KEY = config.get("header_exptime_key")
 HEADER_TEMPERATURE_KEY = config.get("header_temperature_key")
 
+# Header values read_fits_header_info() returns; the master index caches dicts keyed by these
+INDEX_HEADER_KEYS = (HEADER_FILTER_KEY, HEADER_ROTATION_KEY, HEADER_GAIN_KEY, HEADER_OFFSET_KEY,
+                     HEADER_EXPTIME_KEY, HEADER_TEMPERATURE_KEY)
+
+# Header values a master must match exactly
+FLAT_MATCH_KEYS = (HEADER_GAIN_KEY, HEADER_OFFSET_KEY, HEADER_FILTER_KEY)
+DARK_MATCH_KEYS = (HEADER_GAIN_KEY, HEADER_OFFSET_KEY, HEADER_EXPTIME_KEY)
+
 # Instance
 PIXINSIGHT_INSTANCE = config.get("pixinsight_instance")
 
 
-def find_best_master(master_dir: Path, target_meta:dict, date_obs, max_days=None, max_months=None, 
-                     ignore_expt=False, ignore_rot=False, ignore_temp=False, ignore_filter=False):
+def build_master_index(master_dir: Path, match_keys: tuple):
     """
-    Selects the best master calibration frame (flat/dark) based on metadata and timing.
+    Read every master's header and date once and bucket them by the header values in `match_keys`.
+    Returns {match values: [(m_date, day ordinal, month ordinal, master_file, rot, temp), ...]} with each bucket
+    sorted by date.
+    Headers are cached in master_dir/.skystack_master_index.json and only re-read when a master's mtime or size changes.
+    The cache is dropped when the configured header keys differ from the ones it was written with.
     """
-    best_file = None
-    for master_file in master_dir.glob("*.fits"):
+    if not master_dir.is_dir():
+        return {}
+    index_path = master_dir / MASTER_INDEX_NAME
+    # header key names the cached dicts are keyed by; renaming one in config.yaml invalidates the index
+    fingerprint = {"header_keys": list(INDEX_HEADER_KEYS), "match_keys": list(match_keys)}
+    needed = set(match_keys) | {HEADER_ROTATION_KEY, HEADER_TEMPERATURE_KEY}
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        cached = index["masters"] if index.get("fingerprint") == fingerprint else {}
+    except (OSError, ValueError, TypeError, AttributeError, KeyError):
+        cached = {}
+
+    fresh = {}
+    buckets = defaultdict(list)
+    match = itemgetter(*match_keys)
+    with os.scandir(master_dir) as it:
+        entries = sorted((e for e in it if has_suffix(e.name, ".fits") and e.is_file()), key=lambda e: e.name)
+    for entry in entries:
+        master_file = Path(entry.path)
         try:
-            fits_dict = read_fits_header_info(master_file)
+            st = entry.stat()
+            hit = cached.get(entry.name)
+            if (hit and hit["mtime_ns"] == st.st_mtime_ns and hit["size"] == st.st_size
+                    and needed <= hit["header"].keys()):
+                fits_dict = hit["header"]
+            else:
+                # raise rather than get an all-None dict, so a failed read is neither indexed nor cached on disk
+                fits_dict = read_fits_header_info(master_file, raise_on_error=True)
             m_date = parse_date_from_master_path(master_file)
         except Exception as e:
             logger.error(f"Error reading master header {master_file}: {e}")
             continue
-        
-        # Metadata extraction   
-        filt = fits_dict.get(HEADER_FILTER_KEY)
-        expt = fits_dict.get(HEADER_EXPTIME_KEY)
-        rot = fits_dict.get(HEADER_ROTATION_KEY)
-        gain = fits_dict.get(HEADER_GAIN_KEY)
-        offset = fits_dict.get(HEADER_OFFSET_KEY)
-        temp = fits_dict.get(HEADER_TEMPERATURE_KEY)
+        fresh[entry.name] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "header": fits_dict}
+        if m_date is not None:
+            buckets[match(fits_dict)].append((m_date, m_date.toordinal(), m_date.year * 12 + m_date.month, master_file,
+                                              fits_dict.get(HEADER_ROTATION_KEY), fits_dict.get(HEADER_TEMPERATURE_KEY)))
 
-        # Metadata checks
-        # logger.debug(f"Checking master {master_file} with metadata: {fits_dict} vs target {target_meta}")
-        if not ignore_expt and expt != target_meta[HEADER_EXPTIME_KEY]:
-            continue
-        if not ignore_filter and filt != target_meta[HEADER_FILTER_KEY]:
-            continue
-        if gain != target_meta[HEADER_GAIN_KEY] or offset != target_meta[HEADER_OFFSET_KEY]:
-            continue
-        if not ignore_temp and temp is not None and temp != target_meta[HEADER_TEMPERATURE_KEY]:
+    if fresh != cached:
+        try:
+            data = json.dumps({"fingerprint": fingerprint, "masters": fresh})
+            tmp_path = index_path.with_name(index_path.name + ".tmp")
+            tmp_path.write_text(data)
+            os.replace(tmp_path, index_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write master index {index_path}: {e}")
+
+    for bucket in buckets.values():
+        bucket.sort(key=itemgetter(0))  # stable: same-day masters stay in name order
+    return dict(buckets)
+
+
+def find_best_master(master_index: dict, match_keys: tuple, target_meta: dict, date_obs, max_days=None, max_months=None,
+                     ignore_rot=False, ignore_temp=False):
+    """
+    Selects the best master calibration frame (flat/dark) based on metadata and timing.
+    `master_index` is built by build_master_index() with the same `match_keys`, which must match exactly;
+    rotation and temperature are then checked per master, nearest date first.
+    """
+    bucket = master_index.get(itemgetter(*match_keys)(target_meta))
+    if not bucket or date_obs is None:
+        return None
+    target_rot = None if ignore_rot else target_meta[HEADER_ROTATION_KEY]
+    target_temp = None if ignore_temp else target_meta[HEADER_TEMPERATURE_KEY]
+
+    # distances are plain int differences of the ordinals stored in each entry
+    if max_days is not None:
+        limit, field, target = max_days, 1, date_obs.toordinal()
+    elif max_months is not None:
+        limit, field, target = max_months, 2, date_obs.year * 12 + date_obs.month
+    else:
+        return None
+
+    # Walk outward from date_obs on both sides, always taking the nearer master next.
+    # Distances only grow on each side, so the first master that passes the checks is the closest one.
+    hi = bisect_left(bucket, date_obs, key=itemgetter(0))
+    lo = hi - 1
+    while lo >= 0 or hi < len(bucket):
+        d_lo = abs(bucket[lo][field] - target) if lo >= 0 else None
+        d_hi = abs(bucket[hi][field] - target) if hi < len(bucket) else None
+        if d_hi is None or (d_lo is not None and d_lo < d_hi):
+            i, diff = lo, d_lo
+            lo -= 1
+        else:
+            i, diff = hi, d_hi
+            hi += 1
+        if diff > limit:
+            break
+
+        _, _, _, master_file, rot, temp = bucket[i]
+        # logger.debug(f"Checking master {master_file} (rot={rot}, temp={temp}) vs target {target_meta}")
+        if not ignore_temp and temp is not None and temp != target_temp:
             continue
-        if not ignore_rot and rot is not None and abs(rot - target_meta[HEADER_ROTATION_KEY]) > ROT_TOLERANCE:
+        if not ignore_rot and rot is not None and abs(rot - target_rot) > ROT_TOLERANCE:
             continue
+        return master_file
+
+    return None
+
+
+def _collect_lights(light_dir: Path, output_dir: Path):
+    """
+    List the (fits_file, out_path) pairs for every light under `light_dir`.
+    Everything below one top-level folder belongs to the same target, so the target name is resolved once per folder.
+    The top-level folders are walked in parallel, since listing directories is I/O bound.
+    """
+    lights = []
+    top_dirs = []
+    with os.scandir(light_dir) as it:
+        for top in it:
+            if top.is_dir(follow_symlinks=False):
+                top_dirs.append(top.path)
+            elif top.is_file() and has_suffix(top.name, ".fits"):
+                lights.append((Path(top.path), output_dir / get_target_name(top.path)))
+
+    def walk(top_path):
+        out_path = output_dir / get_target_name(top_path)
+        return [(Path(e.path), out_path) for e in scandir_recursive(top_path, ".fits")]
+
+    with ThreadPoolExecutor(max_workers=HEADER_READ_WORKERS) as ex:
+        for found in ex.map(walk, top_dirs):
+            lights.extend(found)
+    return lights
 
-        # Timing checks
-        # logger.debug(f"Checking master {master_file} with date {m_date} against target date {date_obs}")
-        # logger.debug(f"Time diff: {abs((m_date - date_obs).days)} days. Max= {max_days} days. Max months= {max_months} months.")
-        if max_days is not None and abs((m_date - date_obs).days) <= max_days:
-            best_file = master_file
-        if max_months is not None:
-            month_diff = abs((m_date.year - date_obs.year) * 12 + (m_date.month - date_obs.month))
-            if month_diff <= max_months:
-                best_file = master_file
 
-    return best_file
+def _read_light_header(fits_file: Path):
+    """Return (fits_dict, date_obs) for a light frame, or None if it can't be read."""
+    try:
+        fits_dict = read_fits_header_info(fits_file)
+        date_obs = parse_date_from_path(fits_file) or None
+        # logger.debug(f"Processing light frame: {fits_file} with date {date_obs}")
+    except Exception as e:
+        logger.error(f"Error reading light header {fits_file}: {e}")
+        return None
+    return fits_dict, date_obs
+
+
+def _save_calibration_log(path: Path, log_data: dict):
+    """Write the log to a temp file and swap it in, so an interrupted run never leaves a truncated log."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    if orjson is not None:
+        # exposure keys are floats; OPT_NON_STR_KEYS writes them as "300.0" like json does
+        tmp_path.write_bytes(orjson.dumps(log_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(log_data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _load_calibration_log(path: Path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _log_entry(log_data: dict, flat_master, dark_master, expt, filt, date_obs):
+    """Return the log_data[date][filter][exposure] entry for a group, creating it if needed."""
+    light_date = date_obs.strftime("%d-%m-%Y")
+    if light_date not in log_data.keys():
+        log_data[light_date] = {}
+    log_date = log_data[light_date]
+    if filt not in log_date:
+        log_data[light_date][filt] = {}
+    log_filter = log_data[light_date][filt]
+    if expt not in log_filter:
+        log_data[light_date][filt][expt] = {
+            "flat_master": str(flat_master),
+            "dark_master": str(dark_master),
+            "num lights": 0,
+            "num calibrated": 0,
+            "failed lights": []
+        }
+    return log_data[light_date][filt][expt]
+
+
+def _check_calibrated(out_path: Path, light_files: list, date_obs, log_expt: dict):
+    """Count the lights of a group that PixInsight calibrated into `log_expt`; the rest are logged as failed."""
+    # PixInsight writes <stem>__DDMMYYYY_c.fits (or .xisf)
+    date_str = date_obs.strftime("%d%m%Y")
+    fits_suffix = f"__{date_str}_c.fits"
+    xisf_suffix = f"__{date_str}_c.xisf"
+    # list the output directory once instead of stat'ing every expected file
+    with os.scandir(out_path) as it:
+        out_names = {entry.name for entry in it}
+    # per-file messages: skip building them when debug output is off
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for fits_file in light_files:
+        calibrated_name_fits = fits_file.stem + fits_suffix
+        calibrated_name_xisf = fits_file.stem + xisf_suffix
+        if calibrated_name_fits in out_names:
+            if debug:
+                logger.debug(f"Calibrated: {fits_file} -> {out_path / calibrated_name_fits}")
+        elif calibrated_name_xisf in out_names:
+            if debug:
+                logger.debug(f"Calibrated: {fits_file} -> {out_path / calibrated_name_xisf}")
+        else:
+            logger.error(f"Calibration failed for {fits_file}")
+            log_expt["failed lights"].append(str(fits_file))
+            continue
+        log_expt["num calibrated"] += 1
 
 
 def calibrate_lights(
@@ -113,16 +294,22 @@ def calibrate_lights(
         },
     }
     """
-    calibration_groups = defaultdict(list)
+    # {out_path: {(flat, dark, expt, filter, date): [lights]}}
+    calibration_groups = defaultdict(lambda: defaultdict(list))
+    flat_index = build_master_index(flats_dir, FLAT_MATCH_KEYS)
+    dark_index = build_master_index(darks_dir, DARK_MATCH_KEYS)
 
-    for fits_file in light_dir.rglob("*.fits"):
-        try:
-            fits_dict = read_fits_header_info(fits_file)
-            date_obs = parse_date_from_path(fits_file) or None
-            # logger.debug(f"Processing light frame: {fits_file} with date {date_obs}")
-        except Exception as e:
-            logger.error(f"Error reading light header {fits_file}: {e}")
+    # Lights sharing a target, date and header settings resolve to the same masters,
+    # so group them first and look the masters up once per group
+    light_groups = defaultdict(list)
+    lights = _collect_lights(light_dir, output_dir)
+    with ThreadPoolExecutor(max_workers=HEADER_READ_WORKERS) as ex:
+        light_headers = list(ex.map(_read_light_header, [fits_file for fits_file, _ in lights]))
+
+    for (fits_file, out_path), header in zip(lights, light_headers):
+        if header is None:
             continue
+        fits_dict, date_obs = header
         
         # Metadata extraction
         filt = fits_dict.get(HEADER_FILTER_KEY)
@@ -132,9 +319,9 @@ def calibrate_lights(
         expt = fits_dict.get(HEADER_EXPTIME_KEY)
         temp = fits_dict.get(HEADER_TEMPERATURE_KEY)
 
-        # Build output path
-        out_path = output_dir / get_target_name(fits_file)
+        light_groups[(out_path, date_obs, filt, rot, gain, offset, expt, temp)].append(fits_file)
 
+    for (out_path, date_obs, filt, rot, gain, offset, expt, temp), fits_files in light_groups.items():
         ensure_dir(out_path)
 
         flat_meta = {
@@ -144,8 +331,8 @@ def calibrate_lights(
             HEADER_ROTATION_KEY: rot
         }
         flat_master = find_best_master(
-            flats_dir, flat_meta, date_obs,
-            max_days=MAX_FLAT_DAYS_DIFF, ignore_expt=True, ignore_temp=True
+            flat_index, FLAT_MATCH_KEYS, flat_meta, date_obs,
+            max_days=MAX_FLAT_DAYS_DIFF, ignore_temp=True
         )
         
         dark_meta = {
@@ -155,90 +342,104 @@ def calibrate_lights(
             HEADER_TEMPERATURE_KEY: temp
         }
         dark_master = find_best_master(
-            darks_dir, dark_meta, date_obs,
-            max_months=MAX_DARK_MONTHS_DIFF, ignore_rot=True, ignore_filter=True
+            dark_index, DARK_MATCH_KEYS, dark_meta, date_obs,
+            max_months=MAX_DARK_MONTHS_DIFF, ignore_rot=True
         )
 
         if not flat_master or not dark_master:
-            logger.debug(f"Skipping calibration for {fits_file}: missing master (flat={flat_master}, dark={dark_master})")
+            logger.debug(f"Skipping calibration for {len(fits_files)} {expt}s {filt} lights in {out_path.name}: "
+                         f"missing master (flat={flat_master}, dark={dark_master})")
             continue
         
-        # grouping by (flat, dark, outpath)
-        calibration_groups[(flat_master, dark_master, out_path, expt, filt, date_obs)].append((fits_file))
+        # grouping by target, then (flat, dark, expt, filter, date)
+        calibration_groups[out_path][(flat_master, dark_master, expt, filt, date_obs)].extend(fits_files)
         
         
-    # Get the total number of files for a given out_path
-    targets = {out_path:  out_path / "calibration_log.json"  for (_, _, out_path, _, _, _), files in calibration_groups.items()}
-    # Create a log file in the output directory for each target: out_path/calibration_log.json
-    for target_path, calib_path in targets.items():
-        if not calib_path.exists():
-            with open(calib_path, 'w') as f:
-                json.dump({"Target name": out_path.name}, f, indent=2)
-                
-                
+    # Unless overwriting, drop groups whose lights all have a calibrated output already
+    if not OVERWRITE_EXISTING:
+        for out_path, target_groups in calibration_groups.items():
+            with os.scandir(out_path) as it:
+                out_names = {entry.name for entry in it}
+            for group_key, light_files in list(target_groups.items()):
+                _, _, expt, filt, date_obs = group_key
+                date_str = date_obs.strftime("%d%m%Y")
+                if all(f"{f.stem}__{date_str}_c.fits" in out_names or f"{f.stem}__{date_str}_c.xisf" in out_names
+                       for f in light_files):
+                    logger.info(f"Skipping {len(light_files)} already calibrated {expt}s {filt} lights in {out_path.name}")
+                    del target_groups[group_key]
+
     force_new_inst = True
     if instance is not None and instance < 0:
         force_new_inst = False
-    # launch pixinsight
-    if force_new_inst:  
+    # launch pixinsight, only if there is something left to calibrate
+    if force_new_inst and any(calibration_groups.values()):
         launch_pixinsight(instance=instance)
 
-    # Process each group
-    for (flat_master, dark_master, out_path, expt, filt, date_obs), light_files in calibration_groups.items():
-        logger.info(f"Calibrating {len(light_files)} {expt}s {filt} lights with flat={flat_master}, dark={dark_master}")
-        
-        # update calibration log
-        calib_log_path = out_path / "calibration_log.json"
-        with open(calib_log_path, 'r+') as f:
-            log_data = json.load(f)
-        
-        # Initialize nested structure, if needed
-        light_date = date_obs.strftime("%d-%m-%Y")
-        if light_date not in log_data.keys():
-            log_data[light_date] = {}
-        log_date = log_data[light_date]
-        if filt not in log_date:
-            log_data[light_date][filt] = {}
-        log_filter = log_data[light_date][filt]
-        if expt not in log_filter:
-            log_data[light_date][filt][expt] = {
-                "flat_master": str(flat_master),
-                "dark_master": str(dark_master),
-                "num lights": 0,
-                "num calibrated": 0,
-                "failed lights": []
-            }
-        log_expt = log_data[light_date][filt][expt]
-            
-        # running calibration on light group
-        calibrate_with_pixinsight(light_files, 
-                                  flat_master, 
-                                  dark_master,
-                                  out_path,
-                                  date_obs,
-                                  instance=instance)
-
-        for fits_file in light_files:
-            calibrated = True
-            calibrated_file_fits = out_path / fits_file.name.replace(".fits", f'__{date_obs.strftime("%d%m%Y")}_c.fits')
-            calibrated_file_xisf = out_path / fits_file.name.replace(".fits", f'__{date_obs.strftime("%d%m%Y")}_c.xisf')
-            if calibrated_file_fits.exists():
-                logger.debug(f"Calibrated: {fits_file} -> {calibrated_file_fits}")
-            elif calibrated_file_xisf.exists():
-                logger.debug(f"Calibrated: {fits_file} -> {calibrated_file_xisf}")
-            else:
-                logger.error(f"Calibration failed for {fits_file}")
-                calibrated = False
-                log_expt["failed lights"].append(str(fits_file))
-                continue
-            log_expt["num calibrated"] += 1 if calibrated else 0
-    
-        # save updated calibration log
-        with open(calib_log_path, 'w') as f:
-            json.dump(log_data, f, indent=4)
+    # Process each target; its calibration log (out_path/calibration_log.json) is loaded once,
+    # updated in memory by every group and written back after the target's last group.
+    # PixInsight calibrates one group at a time on a single worker thread; while a group runs,
+    # the main thread checks the previous group's outputs and prepares the next one.
+    logs = {}  # {out_path: (calib_log_path, log_data)}
+    groups_left = {out_path: len(target_groups) for out_path, target_groups in calibration_groups.items()}
+    in_flight = None  # (future, out_path, group key, light_files)
+
+    def finish(future, out_path, group_key, light_files):
+        future.result()
+        # the log only gets entries for groups PixInsight has finished
+        log_expt = _log_entry(logs[out_path][1], *group_key)
+        _check_calibrated(out_path, light_files, group_key[4], log_expt)
+        groups_left[out_path] -= 1
+        if groups_left[out_path] == 0:
+            # save updated calibration log
+            _save_calibration_log(*logs.pop(out_path))
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pi_runner:
+            for out_path, target_groups in calibration_groups.items():
+                if not target_groups:
+                    continue
+                calib_log_path = out_path / "calibration_log.json"
+                if calib_log_path.exists():
+                    log_data = _load_calibration_log(calib_log_path)
+                else:
+                    log_data = {"Target name": out_path.name}
+                logs[out_path] = (calib_log_path, log_data)
+
+                for group_key, light_files in target_groups.items():
+                    flat_master, dark_master, expt, filt, date_obs = group_key
+                    logger.info(f"Calibrating {len(light_files)} {expt}s {filt} lights with flat={flat_master}, dark={dark_master}")
+                    
+                    # running calibration on light group
+                    future = pi_runner.submit(calibrate_with_pixinsight,
+                                              light_files, 
+                                              flat_master, 
+                                              dark_master,
+                                              out_path,
+                                              date_obs,
+                                              instance=instance)
+                    prev, in_flight = in_flight, (future, out_path, group_key, light_files)
+                    if prev is not None:
+                        try:
+                            finish(*prev)
+                        except Exception:
+                            # this group is already queued and will run regardless, so wait for it and
+                            # log its outputs too; otherwise a re-run would skip them as done but unlogged
+                            try:
+                                finish(*in_flight)
+                            except Exception:
+                                logger.exception(f"Calibration failed for group {group_key} in {out_path.name}")
+                            in_flight = None
+                            raise
+
+            if in_flight is not None:
+                finish(*in_flight)
+    finally:
+        # a failed run still keeps what the finished groups recorded
+        for calib_log_path, log_data in logs.values():
+            _save_calibration_log(calib_log_path, log_data)
     
     # Return paths to directories with new/updated calibration logs
-    return [out_path for (_, _, out_path, _, _, _), _ in calibration_groups.items() if out_path.exists()]
+    return [out_path for out_path in calibration_groups if out_path.exists()]
             
             
 
@@ -253,6 +454,8 @@ def main():
     target_out_dir = CALIBRATED_OUTPUT_DIR / get_target_name(LIGHT_BASE_DIR)
     calib_log_path = target_out_dir / "calibration_log.json"
     if calib_log_path.exists():
+        # matplotlib/pandas take a while to import, so only load them when there is something to plot
+        from astro_utils.plotting import plot_summary
         plot_summary(calib_log_path)
         logger.info(f"Summary plot saved for {target_out_dir}")
 
@@ -3,6 +3,8 @@
     Now reads configuration from JSON files:
     - input_files.json: array of input file paths
     - params.json: { output_path: "..." }
+    or, to stack several groups in one run:
+    - params.json: { jobs: [ { input_files: [...], output_path: "..." }, ... ] }
 */
 
 function readJson(path) {
@@ -21,15 +23,35 @@ function main() {
     let paramFilePath = configDir + "params.json";
 
     // Load input files and output path
-    let inputFiles = readJson(inputFilePath);
     let params = readJson(paramFilePath);
 
-    if (!inputFiles || inputFiles.length < 2) {
-        console.criticalln("Error: Need at least two input files.");
-        exit(1);
+    if (params.jobs) {
+        // Batch mode: one integration per job; a failed job doesn't stop the rest
+        for (let i = 0; i < params.jobs.length; i++) {
+            let job = params.jobs[i];
+            console.writeln(">> Job " + (i + 1) + "/" + params.jobs.length + ": " + job.output_path);
+            try {
+                integrate(job.input_files, job.output_path);
+            } catch (error) {
+                console.criticalln("Job failed: " + error.message);
+            }
+        }
+    } else {
+        let inputFiles = readJson(inputFilePath);
+        if (!inputFiles || inputFiles.length < 2) {
+            console.criticalln("Error: Need at least two input files.");
+            exit(1);
+        }
+        integrate(inputFiles, params.output_path);
     }
 
-    let outputPath = params.output_path;
+    writeSignal();
+}
+
+function integrate(inputFiles, outputPath) {
+    if (!inputFiles || inputFiles.length < 2) {
+        throw new Error("Need at least two input files.");
+    }
 
     // console.writeln("Input files:");
     // inputFiles.forEach(f => console.writeln(" - " + f));
@@ -84,29 +106,33 @@ function main() {
             false           // overwrite protection
         );
 
+        // close it so windows don't pile up over a batch of jobs
+        win.forceClose();
     } else {
         throw new Error("No active image window after ImageIntegration — integration likely failed.");
     }
+}
 
+function writeSignal() {
     // Writing signal file to indicate completion
     try {
-    var scriptDir = "C:/Temp/PixStack";
-    var filePath = scriptDir + "/basic_stack_complete.tmp";
-
-    // Ensure the directory exists
-    if (!File.directoryExists(scriptDir)) {
-        File.createDirectory(scriptDir);
+        var scriptDir = "C:/Temp/PixStack";
+        var filePath = scriptDir + "/basic_stack_complete.tmp";
+
+        // Ensure the directory exists
+        if (!File.directoryExists(scriptDir)) {
+            File.createDirectory(scriptDir);
+        }
+
+        // Write the signal file
+        let file = new File();
+        file.createForWriting(filePath);
+        file.outTextLn("done");
+        file.close();
+        console.writeln("Signal file created successfully: " + filePath);
+    } catch (error) {
+        console.writeln("Error creating signal file: " + error.message);
     }
-
-    // Write the signal file
-    let file = new File();
-    file.createForWriting(filePath);
-    file.outTextLn("done");
-    file.close();
-    console.writeln("Signal file created successfully: " + filePath);
-} catch (error) {
-    console.writeln("Error creating signal file: " + error.message);
-}
 }
 
-main();
\ No newline at end of file
+main();
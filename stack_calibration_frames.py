@@ -2,13 +2,16 @@
 import argparse
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from astro_utils.config_loader import load_config
-from astro_utils.fits_helpers import read_fits_header_info, parse_date_from_path, get_val, write_header_info
-from astro_utils.pixinsight_cli import launch_pixinsight, stack_with_pixinsight
-from astro_utils.file_ops import ensure_dir
+from astro_utils.fits_helpers import (read_fits_header_info, parse_date_from_path, get_val, write_header_info,
+                                     HEADER_READ_WORKERS)
+from astro_utils.pixinsight_cli import launch_pixinsight, stack_batches_with_pixinsight
+from astro_utils.file_ops import ensure_dir, scandir_recursive
 import logging
 import shutil
 import os
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +26,7 @@ HEADER_OFFSET_KEY = config.get("header_offset_key")
 HEADER_EXPTIME_KEY = config.get("header_exptime_key")
 HEADER_TEMPERATURE_KEY = config.get("header_temperature_key") 
 HEADER_IMGTYPE_KEY = config.get("header_img_type_key")
+OVERWRITE_EXISTING = config.get("overwrite_existing", False)
 
 def move_to_used(file: Path):
     used_dir = file.parent / "USED"
@@ -33,29 +37,37 @@ def move_to_used(file: Path):
     except OSError:
         shutil.move(str(file), str(dest))  # fallback for cross-device move
 
+def _read_frame(fits_file: Path):
+    """Return (fits_dict, date_obs) for a calibration frame, or None if it can't be read."""
+    logger.debug("Processing %s", fits_file)
+    try:
+        return read_fits_header_info(fits_file), parse_date_from_path(fits_file)
+    except OSError:
+        logger.error(f"OSError: likely corrupt file: {fits_file}")
+    except Exception as e:
+        logger.error(f"Error processing {fits_file}: {e}")
+    return None
+
 def group_by_settings(dir: Path, header_keys=None):
     groups = defaultdict(list)
-    for fits_file in dir.rglob("*.fits"):
-        if "USED" not in fits_file.parts:
-            logger.debug(f"Processing {fits_file}")
-            try:
-                fits_dict = read_fits_header_info(fits_file)
-                date_obs = parse_date_from_path(fits_file)
-                
-                if date_obs is None:
-                    continue
-                
-                key_dict = {}
-                for k in header_keys:
-                    key_dict[k] = fits_dict.get(k)
-                key_dict["date"] = date_obs.strftime("%Y-%m-%d")
-                key = tuple(key_dict.items())
-                groups[key].append((fits_file, date_obs))
-                
-            except OSError:
-                logger.error(f"OSError: likely corrupt file: {fits_file}")
-            except Exception as e:
-                logger.error(f"Error processing {fits_file}: {e}")
+    fits_files = [Path(e.path) for e in scandir_recursive(dir, ".fits", skip_dirs=("USED",))]
+    # Header reads are I/O bound; grouping stays on this thread
+    with ThreadPoolExecutor(max_workers=HEADER_READ_WORKERS) as ex:
+        frames = list(ex.map(_read_frame, fits_files))
+
+    for fits_file, frame in zip(fits_files, frames):
+        if frame is None:
+            continue
+        fits_dict, date_obs = frame
+        if date_obs is None:
+            continue
+        
+        key_dict = {}
+        for k in header_keys:
+            key_dict[k] = fits_dict.get(k)
+        key_dict["date"] = date_obs.isoformat()  # YYYY-MM-DD
+        key = tuple(key_dict.items())
+        groups[key].append((fits_file, date_obs))
     return groups
 
 def safe_fmt(value, fmt=str):
@@ -77,61 +89,85 @@ def stack(groups: dict, output_dir: Path, master_name_pref:str, master_name_fmt:
     if instance is not None and instance < 0:
         force_new_inst = False
         instance = None
-        
-    # launch pixinsight
-    if force_new_inst:
-        launch_pixinsight(instance=instance)
 
     ensure_dir(output_dir)
+    pref_lower = master_name_pref.lower()
+    img_type = f"Master {master_name_pref.capitalize()}"
+    # Master name template, built once: master<Pref>_{0}<unit>_{1}<unit>...__{date}.fits
+    name_tpl = ("master" + pref_lower.capitalize()
+                + "".join(f"_{{{j}}}{v[1]}" for j, v in enumerate(master_name_fmt.values()))
+                + "__{date}.fits")
+    jobs = []  # (batch, out_path)
     ngroups = len(groups)
     i = 1
     for key, files_dates in groups.items():
         logger.debug(f"Processing group {i}/{ngroups} with {len(files_dates)} files.")
         i += 1
         files_dates.sort(key=lambda x: x[1])
-        while files_dates:
-            base_date = files_dates[0][1]
-            batch = [fd[0] for fd in files_dates if abs((fd[1] - base_date).days) <= max_days_diff]
-            if rot_tolerance is not None:
-                rot = get_val(HEADER_ROTATION_KEY, key)
-                if rot is not None:
-                    batch = [f for f in batch if abs(read_fits_header_info(f)[HEADER_ROTATION_KEY] - rot) <= rot_tolerance]
+        # Rotation check for every file in the group, done once as one array compare rather than per batch
+        rot = get_val(HEADER_ROTATION_KEY, key) if rot_tolerance is not None else None
+        if rot is not None:
+            rots = np.array([read_fits_header_info(f)[HEADER_ROTATION_KEY] for f, _ in files_dates], dtype=float)
+            rot_ok = dict(zip((f for f, _ in files_dates), np.abs(rots - rot) <= rot_tolerance))
+        # Sweep the date-sorted files: each batch runs from `left` up to the first file more than
+        # max_days_diff after the batch's first date
+        ordinals = [d.toordinal() for _, d in files_dates]
+        left, n = 0, len(files_dates)
+        while left < n:
+            base_date = files_dates[left][1]
+            last_day = ordinals[left] + max_days_diff
+            right = left + 1
+            while right < n and ordinals[right] <= last_day:
+                right += 1
+            batch = [f for f, _ in files_dates[left:right]]
+            left = right
+            if rot is not None:
+                in_tol = [f for f in batch if rot_ok[f]]
+                if len(in_tol) < len(batch):
+                    logger.warning(f"Skipping {len(batch) - len(in_tol)} files outside rotation tolerance for key {key}.")
+                batch = in_tol
+            if not batch:
+                continue
 
             logger.debug(f"Processing batch for key {key} with {len(batch)} files.")
-            files_dates = [fd for fd in files_dates if fd[0] not in batch]
-            
-            # Format master name using provided template
-            master_name = "master" + master_name_pref.lower().capitalize()
-            for k, v in master_name_fmt.items():
-                master_name += f"_{safe_fmt(get_val(k, key), v[0])}{v[1]}"
-            master_name += f"__{base_date.strftime('%d%m%Y')}.fits"            
             
-            out_path = output_dir / master_name
-            stack_with_pixinsight(batch, 
-                                  out_path, 
-                                  instance=instance)
-            # check if file was created
-            if out_path.exists():
-                # Add necessary FITS header info
-                fits_dict = read_fits_header_info(batch[0])
-                header_dict = {
-                    HEADER_FILTER_KEY: fits_dict.get(HEADER_FILTER_KEY),
-                    HEADER_ROTATION_KEY: fits_dict.get(HEADER_ROTATION_KEY),
-                    HEADER_GAIN_KEY: fits_dict.get(HEADER_GAIN_KEY),
-                    HEADER_OFFSET_KEY: fits_dict.get(HEADER_OFFSET_KEY),
-                    HEADER_EXPTIME_KEY: fits_dict.get(HEADER_EXPTIME_KEY),
-                    HEADER_TEMPERATURE_KEY: fits_dict.get(HEADER_TEMPERATURE_KEY),
-                    HEADER_IMGTYPE_KEY: f"Master {master_name_pref.capitalize()}"
-                }
-                logger.debug(f"Updating header for {out_path} with {header_dict}")
-                write_header_info(out_path, header_dict)
-                logger.debug(f"Created master {master_name_pref.lower()}: {out_path}")
-                # Move files to USED
-                for file in batch:
-                    if "USED" not in file.parts:
-                        move_to_used(file)
-            else:
-                logger.error(f"Failed to create master {master_name_pref.lower()}: {out_path}")
-                break
+            master_name = name_tpl.format(*(safe_fmt(get_val(k, key), v[0]) for k, v in master_name_fmt.items()),
+                                          date=base_date.strftime('%d%m%Y'))
+            jobs.append((batch, output_dir / master_name))
+
+    # Unless overwriting, only stack masters that don't exist yet. The frames of skipped jobs are left
+    # where they are: they were never integrated, so they must not be retired to USED.
+    pending = jobs if OVERWRITE_EXISTING else [job for job in jobs if not job[1].exists()]
+    if len(pending) < len(jobs):
+        logger.warning(f"Skipping {len(jobs) - len(pending)} existing master {pref_lower}(s); "
+                       f"their frames are left in place (set overwrite_existing to restack them).")
+
+    # Stack every pending batch in a single PixInsight run, launching PixInsight only if there is work
+    if pending:
+        if force_new_inst:
+            launch_pixinsight(instance=instance)
+        stack_batches_with_pixinsight(pending, instance=instance)
 
-                
\ No newline at end of file
+    for batch, out_path in pending:
+        # check if file was created
+        if out_path.exists():
+            # Add necessary FITS header info
+            fits_dict = read_fits_header_info(batch[0])
+            header_dict = {
+                HEADER_FILTER_KEY: fits_dict.get(HEADER_FILTER_KEY),
+                HEADER_ROTATION_KEY: fits_dict.get(HEADER_ROTATION_KEY),
+                HEADER_GAIN_KEY: fits_dict.get(HEADER_GAIN_KEY),
+                HEADER_OFFSET_KEY: fits_dict.get(HEADER_OFFSET_KEY),
+                HEADER_EXPTIME_KEY: fits_dict.get(HEADER_EXPTIME_KEY),
+                HEADER_TEMPERATURE_KEY: fits_dict.get(HEADER_TEMPERATURE_KEY),
+                HEADER_IMGTYPE_KEY: img_type
+            }
+            logger.debug(f"Updating header for {out_path} with {header_dict}")
+            write_header_info(out_path, header_dict)
+            logger.debug(f"Created master {pref_lower}: {out_path}")
+            # Move files to USED
+            for file in batch:
+                if "USED" not in file.parts:
+                    move_to_used(file)
+        else:
+            logger.error(f"Failed to create master {pref_lower}: {out_path}")